@@ -16,6 +16,7 @@
 
 
 import argparse
+import io
 from collections import OrderedDict
 from pathlib import Path
 
@@ -25,7 +26,7 @@ from PIL import Image
 import requests
 from transformers import DetrConfig, DetrFeatureExtractor, DetrForObjectDetection, DetrForSegmentation
 from transformers.utils import logging
-from transformers.utils.coco_classes import id2label
+from transformers.utils.coco_classes import id2label, label2id
 
 
 logging.set_verbosity_info()
@@ -170,7 +171,9 @@ def read_in_q_k_v(state_dict, is_panoptic=False):
 # We will verify our results on an image of cute cats
 def prepare_img():
     url = "http://images.cocodataset.org/val2017/000000039769.jpg"
-    im = Image.open(requests.get(url, stream=True).raw)
+    response = requests.get(url, timeout=30)
+    response.raise_for_status()
+    im = Image.open(io.BytesIO(response.content))
 
     return im
 
@@ -194,7 +197,7 @@ def convert_detr_checkpoint(model_name, pytorch_dump_folder_path):
     else:
         config.num_labels = 91
         config.id2label = id2label
-        config.label2id = {v: k for k, v in id2label.items()}
+        config.label2id = label2id
 
     # load feature extractor
     format = "coco_panoptic" if is_panoptic else "coco_detection"
@@ -16,6 +16,7 @@
 
 
 import argparse
+import io
 from pathlib import Path
 
 import torch
@@ -25,7 +26,7 @@ import requests
 import timm
 from transformers import DeiTFeatureExtractor, ViTConfig, ViTFeatureExtractor, ViTForImageClassification, ViTModel
 from transformers.utils import logging
-from transformers.utils.imagenet_classes import id2label
+from transformers.utils.imagenet_classes import id2label, label2id
 
 
 logging.set_verbosity_info()
@@ -34,52 +35,52 @@ logger = logging.get_logger(__name__)
 
 # here we list all keys to be renamed (original name on the left, our name on the right)
 def create_rename_keys(config, base_model=False):
-    rename_keys = []
+    rename_keys = {}
     for i in range(config.num_hidden_layers):
         # encoder layers: output projection, 2 feedforward neural networks and 2 layernorms
-        rename_keys.append((f"blocks.{i}.norm1.weight", f"vit.encoder.layer.{i}.layernorm_before.weight"))
-        rename_keys.append((f"blocks.{i}.norm1.bias", f"vit.encoder.layer.{i}.layernorm_before.bias"))
-        rename_keys.append((f"blocks.{i}.attn.proj.weight", f"vit.encoder.layer.{i}.attention.output.dense.weight"))
-        rename_keys.append((f"blocks.{i}.attn.proj.bias", f"vit.encoder.layer.{i}.attention.output.dense.bias"))
-        rename_keys.append((f"blocks.{i}.norm2.weight", f"vit.encoder.layer.{i}.layernorm_after.weight"))
-        rename_keys.append((f"blocks.{i}.norm2.bias", f"vit.encoder.layer.{i}.layernorm_after.bias"))
-        rename_keys.append((f"blocks.{i}.mlp.fc1.weight", f"vit.encoder.layer.{i}.intermediate.dense.weight"))
-        rename_keys.append((f"blocks.{i}.mlp.fc1.bias", f"vit.encoder.layer.{i}.intermediate.dense.bias"))
-        rename_keys.append((f"blocks.{i}.mlp.fc2.weight", f"vit.encoder.layer.{i}.output.dense.weight"))
-        rename_keys.append((f"blocks.{i}.mlp.fc2.bias", f"vit.encoder.layer.{i}.output.dense.bias"))
+        rename_keys[f"blocks.{i}.norm1.weight"] = f"vit.encoder.layer.{i}.layernorm_before.weight"
+        rename_keys[f"blocks.{i}.norm1.bias"] = f"vit.encoder.layer.{i}.layernorm_before.bias"
+        rename_keys[f"blocks.{i}.attn.proj.weight"] = f"vit.encoder.layer.{i}.attention.output.dense.weight"
+        rename_keys[f"blocks.{i}.attn.proj.bias"] = f"vit.encoder.layer.{i}.attention.output.dense.bias"
+        rename_keys[f"blocks.{i}.norm2.weight"] = f"vit.encoder.layer.{i}.layernorm_after.weight"
+        rename_keys[f"blocks.{i}.norm2.bias"] = f"vit.encoder.layer.{i}.layernorm_after.bias"
+        rename_keys[f"blocks.{i}.mlp.fc1.weight"] = f"vit.encoder.layer.{i}.intermediate.dense.weight"
+        rename_keys[f"blocks.{i}.mlp.fc1.bias"] = f"vit.encoder.layer.{i}.intermediate.dense.bias"
+        rename_keys[f"blocks.{i}.mlp.fc2.weight"] = f"vit.encoder.layer.{i}.output.dense.weight"
+        rename_keys[f"blocks.{i}.mlp.fc2.bias"] = f"vit.encoder.layer.{i}.output.dense.bias"
 
     # projection layer + position embeddings
-    rename_keys.extend(
-        [
-            ("cls_token", "vit.embeddings.cls_token"),
-            ("patch_embed.proj.weight", "vit.embeddings.patch_embeddings.projection.weight"),
-            ("patch_embed.proj.bias", "vit.embeddings.patch_embeddings.projection.bias"),
-            ("pos_embed", "vit.embeddings.position_embeddings"),
-        ]
+    rename_keys.update(
+        {
+            "cls_token": "vit.embeddings.cls_token",
+            "patch_embed.proj.weight": "vit.embeddings.patch_embeddings.projection.weight",
+            "patch_embed.proj.bias": "vit.embeddings.patch_embeddings.projection.bias",
+            "pos_embed": "vit.embeddings.position_embeddings",
+        }
     )
 
     if base_model:
         # layernorm + pooler
-        rename_keys.extend(
-            [
-                ("norm.weight", "layernorm.weight"),
-                ("norm.bias", "layernorm.bias"),
-                ("pre_logits.fc.weight", "pooler.dense.weight"),
-                ("pre_logits.fc.bias", "pooler.dense.bias"),
-            ]
+        rename_keys.update(
+            {
+                "norm.weight": "layernorm.weight",
+                "norm.bias": "layernorm.bias",
+                "pre_logits.fc.weight": "pooler.dense.weight",
+                "pre_logits.fc.bias": "pooler.dense.bias",
+            }
         )
 
         # if just the base model, we should remove "vit" from all keys that start with "vit"
-        rename_keys = [(pair[0], pair[1][4:]) if pair[1].startswith("vit") else pair for pair in rename_keys]
+        rename_keys = {k: v[4:] if v.startswith("vit") else v for k, v in rename_keys.items()}
     else:
         # layernorm + classification head
-        rename_keys.extend(
-            [
-                ("norm.weight", "vit.layernorm.weight"),
-                ("norm.bias", "vit.layernorm.bias"),
-                ("head.weight", "classifier.weight"),
-                ("head.bias", "classifier.bias"),
-            ]
+        rename_keys.update(
+            {
+                "norm.weight": "vit.layernorm.weight",
+                "norm.bias": "vit.layernorm.bias",
+                "head.weight": "classifier.weight",
+                "head.bias": "classifier.bias",
+            }
         )
 
     return rename_keys
@@ -95,21 +96,15 @@ def read_in_q_k_v(state_dict, config, base_model=False):
         # read in weights + bias of input projection layer (in timm, this is a single matrix + bias)
         in_proj_weight = state_dict.pop(f"blocks.{i}.attn.qkv.weight")
         in_proj_bias = state_dict.pop(f"blocks.{i}.attn.qkv.bias")
-        # next, add query, keys and values (in that order) to the state dict
-        state_dict[f"{prefix}encoder.layer.{i}.attention.attention.query.weight"] = in_proj_weight[
-            : config.hidden_size, :
-        ]
-        state_dict[f"{prefix}encoder.layer.{i}.attention.attention.query.bias"] = in_proj_bias[: config.hidden_size]
-        state_dict[f"{prefix}encoder.layer.{i}.attention.attention.key.weight"] = in_proj_weight[
-            config.hidden_size : config.hidden_size * 2, :
-        ]
-        state_dict[f"{prefix}encoder.layer.{i}.attention.attention.key.bias"] = in_proj_bias[
-            config.hidden_size : config.hidden_size * 2
-        ]
-        state_dict[f"{prefix}encoder.layer.{i}.attention.attention.value.weight"] = in_proj_weight[
-            -config.hidden_size :, :
-        ]
-        state_dict[f"{prefix}encoder.layer.{i}.attention.attention.value.bias"] = in_proj_bias[-config.hidden_size :]
+        # next, add query, keys and values (in that order) to the state dict, as views of the fused matrix
+        query_weight, key_weight, value_weight = in_proj_weight.chunk(3, dim=0)
+        query_bias, key_bias, value_bias = in_proj_bias.chunk(3, dim=0)
+        state_dict[f"{prefix}encoder.layer.{i}.attention.attention.query.weight"] = query_weight
+        state_dict[f"{prefix}encoder.layer.{i}.attention.attention.query.bias"] = query_bias
+        state_dict[f"{prefix}encoder.layer.{i}.attention.attention.key.weight"] = key_weight
+        state_dict[f"{prefix}encoder.layer.{i}.attention.attention.key.bias"] = key_bias
+        state_dict[f"{prefix}encoder.layer.{i}.attention.attention.value.weight"] = value_weight
+        state_dict[f"{prefix}encoder.layer.{i}.attention.attention.value.bias"] = value_bias
 
 
 def remove_classification_head_(state_dict):
@@ -118,15 +113,12 @@ def remove_classification_head_(state_dict):
         state_dict.pop(k, None)
 
 
-def rename_key(dct, old, new):
-    val = dct.pop(old)
-    dct[new] = val
-
-
 # We will verify our results on an image of cute cats
 def prepare_img():
     url = "http://images.cocodataset.org/val2017/000000039769.jpg"
-    im = Image.open(requests.get(url, stream=True).raw)
+    response = requests.get(url, timeout=30)
+    response.raise_for_status()
+    im = Image.open(io.BytesIO(response.content))
     return im
 
 
@@ -147,7 +139,7 @@ def convert_vit_checkpoint(vit_name, pytorch_dump_folder_path):
     else:
         config.num_labels = 1000
         config.id2label = id2label
-        config.label2id = {v: k for k, v in id2label.items()}
+        config.label2id = label2id
         config.patch_size = int(vit_name[-6:-4])
         config.image_size = int(vit_name[-3:])
     # size of the architecture
@@ -192,8 +184,7 @@ def convert_vit_checkpoint(vit_name, pytorch_dump_folder_path):
     if base_model:
         remove_classification_head_(state_dict)
     rename_keys = create_rename_keys(config, base_model)
-    for src, dest in rename_keys:
-        rename_key(state_dict, src, dest)
+    state_dict = {rename_keys.get(k, k): v for k, v in state_dict.items()}
     read_in_q_k_v(state_dict, config, base_model)
 
     # load HuggingFace model
@@ -146,13 +146,18 @@ class ViTSelfAttention(nn.Module):
         value_layer = self.transpose_for_scores(self.value(hidden_states))
         query_layer = self.transpose_for_scores(mixed_query_layer)
 
+        # Scale the queries rather than the raw attention scores: (batch, heads, seq_len, head_size) is smaller than
+        # (batch, heads, seq_len, seq_len) whenever seq_len > head_size (e.g. 197 vs 64 for patch16 at 224), so the
+        # elementwise division touches less memory; for short sequences (e.g. 50 tokens for patch32) it touches more.
+        query_layer = query_layer / math.sqrt(self.attention_head_size)
+
         # Take the dot product between "query" and "key" to get the raw attention scores.
         attention_scores = torch.matmul(query_layer, key_layer.transpose(-1, -2))
 
-        attention_scores = attention_scores / math.sqrt(self.attention_head_size)
-
-        # Normalize the attention scores to probabilities.
-        attention_probs = nn.Softmax(dim=-1)(attention_scores)
+        # Normalize the attention scores to probabilities. The softmax is upcast to fp32 for models whose weights were
+        # converted to half precision (e.g. with `.half()`), at the cost of an fp32 copy of the scores; autocast
+        # already runs softmax in fp32 on its own.
+        attention_probs = nn.functional.softmax(attention_scores.float(), dim=-1).type_as(attention_scores)
 
         # This is actually dropping out entire tokens to attend to, which might
         # seem a bit unusual, but is taken from the original Transformer paper.
@@ -92,3 +92,6 @@ id2label = {
     89: "hair drier",
     90: "toothbrush",
 }
+
+# COCO class names to id's (for labels that appear more than once, the highest id is kept)
+label2id = {v: k for k, v in id2label.items()}
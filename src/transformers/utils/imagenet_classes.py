@@ -1001,3 +1001,6 @@ id2label = {
     998: "ear, spike, capitulum",
     999: "toilet tissue, toilet paper, bathroom tissue",
 }
+
+# ImageNet 2012 class names to id's (for labels that appear more than once, the highest id is kept)
+label2id = {v: k for k, v in id2label.items()}
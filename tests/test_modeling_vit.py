@@ -19,7 +19,7 @@ import inspect
 import unittest
 
 from transformers.file_utils import cached_property, is_torch_available, is_vision_available
-from transformers.testing_utils import require_torch, require_vision, slow, torch_device
+from transformers.testing_utils import require_torch, require_torch_gpu, require_vision, slow, torch_device
 
 from .test_configuration_common import ConfigTester
 from .test_modeling_common import ModelTesterMixin, floats_tensor, ids_tensor
@@ -114,6 +114,22 @@ class ViTModelTester:
         num_patches = (image_size[1] // patch_size[1]) * (image_size[0] // patch_size[0])
         self.parent.assertEqual(result.last_hidden_state.shape, (self.batch_size, num_patches + 1, self.hidden_size))
 
+    def create_and_check_model_fp16(self, config, pixel_values, labels):
+        model = ViTModel(config=config)
+        model.to(torch_device)
+        model.eval()
+        with torch.no_grad():
+            result = model(pixel_values)
+            model.half()
+            result_fp16 = model(pixel_values.half())
+        # the attention softmax is upcast to fp32, so a model with half-precision weights should stay finite and
+        # close to its fp32 outputs
+        self.parent.assertEqual(result_fp16.last_hidden_state.dtype, torch.float16)
+        self.parent.assertTrue(torch.isfinite(result_fp16.last_hidden_state).all())
+        self.parent.assertTrue(
+            torch.allclose(result_fp16.last_hidden_state.float(), result.last_hidden_state, atol=1e-2)
+        )
+
     def create_and_check_for_image_classification(self, config, pixel_values, labels):
         config.num_labels = self.type_sequence_label_size
         model = ViTForImageClassification(config)
@@ -190,6 +206,11 @@ class ViTModelTest(ModelTesterMixin, unittest.TestCase):
         config_and_inputs = self.model_tester.prepare_config_and_inputs()
         self.model_tester.create_and_check_model(*config_and_inputs)
 
+    @require_torch_gpu
+    def test_model_fp16(self):
+        config_and_inputs = self.model_tester.prepare_config_and_inputs()
+        self.model_tester.create_and_check_model_fp16(*config_and_inputs)
+
     def test_attention_outputs(self):
         config, inputs_dict = self.model_tester.prepare_config_and_inputs_for_common()
         config.return_dict = True